@@ -1,7 +1,7 @@
 import streamlit as st
-import fitz  # PyMuPDF
 from dotenv import load_dotenv
 import os
+import math
 
 # Suppress tokenizer warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -10,19 +10,30 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 from utils import (
     split_text_into_chunks,
     answer_question_with_context,
-    enhanced_chunk_text
+    enhanced_chunk_text,
+    iter_pdf_pages
 )
 from vectorstore_utils import (
-    add_document_to_chromadb,
     search_in_document,
-    get_documents_in_chromadb,
     delete_document_from_chromadb,
     clear_all_chromadb
 )
 from document_manager import DocumentManager
+from ingestion_jobs import IngestionQueue
 
 load_dotenv()
 
+# PDFs larger than this are ingested page by page instead of fully in memory
+STREAMING_THRESHOLD_BYTES = int(os.getenv("STREAMING_THRESHOLD_MB", "20")) * 1024 * 1024
+# Chunks embedded and written to ChromaDB per batch in streaming mode
+STREAMING_BATCH_SIZE = int(os.getenv("STREAMING_BATCH_SIZE", "256"))
+# Maximum characters of an unfinished paragraph buffered by the streaming chunker
+STREAMING_WINDOW_CHARS = int(os.getenv("STREAMING_WINDOW_CHARS", "200000"))
+# Documents shown per page in the sidebar library
+LIBRARY_PAGE_SIZE = 20
+# Maximum number of PDFs ingested concurrently in the background
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
 st.set_page_config(page_title="Chat with your PDFs", page_icon="📄")
 st.title("Chat with your PDFs 📄🤖")
 
@@ -33,22 +44,74 @@ if 'doc_manager' not in st.session_state:
 if 'selected_doc_id' not in st.session_state:
     st.session_state.selected_doc_id = None
 
+@st.cache_resource
+def get_ingestion_queue() -> IngestionQueue:
+    """One background ingestion queue per server process, shared by all sessions"""
+    return IngestionQueue(
+        DocumentManager(),
+        max_workers=INGEST_WORKERS,
+        batch_size=STREAMING_BATCH_SIZE,
+        window_chars=STREAMING_WINDOW_CHARS
+    )
+
+ingestion_queue = get_ingestion_queue()
+
+@st.fragment(run_every=2)
+def show_ingestion_jobs():
+    """Show progress of background ingestion jobs, refreshing every few seconds"""
+    active_jobs = ingestion_queue.list_active_jobs()
+
+    if not active_jobs:
+        # Refresh the whole page once the last watched job has finished
+        if st.session_state.get("watching_jobs"):
+            st.session_state.watching_jobs = False
+            st.rerun()
+        return
+
+    st.session_state.watching_jobs = True
+    st.subheader("⏳ Ingesting")
+    for job in active_jobs:
+        # chunks_total is estimated from the text size until the job finishes
+        progress = job.chunks_done / job.chunks_total if job.chunks_total else 0.0
+        st.progress(min(progress, 1.0), text=f"{job.filename}: {job.chunks_done}/~{job.chunks_total} chunks ({job.status})")
+        if st.button("✖️ Cancel", key=f"cancel_{job.job_id}"):
+            ingestion_queue.cancel(job.job_id)
+            st.rerun(scope="fragment")
+
 # --- Sidebar: Document Library ---
 st.sidebar.header("📚 Document Library")
 
-# Show existing documents
-existing_docs = st.session_state.doc_manager.list_documents()
-if existing_docs:
-    st.sidebar.write(f"**{len(existing_docs)} documents stored:**")
+with st.sidebar:
+    show_ingestion_jobs()
+
+# Show existing documents, one page at a time so rendering cost does not grow with the library
+selected_doc = None
+total_docs = st.session_state.doc_manager.count_documents()
+if total_docs:
+    st.sidebar.write(f"**{total_docs} documents stored:**")
+
+    search = st.sidebar.text_input("🔎 Filter by filename", placeholder="Filename starts with...")
+    match_count = st.session_state.doc_manager.count_documents(search) if search else total_docs
+    page_count = max(1, math.ceil(match_count / LIBRARY_PAGE_SIZE))
+
+    page = 1
+    if page_count > 1:
+        page = st.sidebar.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+    if search:
+        st.sidebar.caption(f"{match_count} matching documents")
+
+    page_docs = st.session_state.doc_manager.list_documents_page(
+        search, limit=LIBRARY_PAGE_SIZE, offset=(page - 1) * LIBRARY_PAGE_SIZE
+    )
 
     # Create a selectbox for choosing which document to chat with
     doc_options = {}
-    for doc in existing_docs:
+    for doc in page_docs:
         display_name = f"{doc.filename} ({doc.chunk_count} chunks)"
-        doc_options[display_name] = doc.doc_id
+        doc_options[display_name] = doc
 
     # Add "All documents" option
-    doc_options["🔍 Search all documents"] = "ALL"
+    doc_options["🔍 Search all documents"] = None
 
     selected_display = st.sidebar.selectbox(
         "Chat with which document?",
@@ -56,28 +119,28 @@ if existing_docs:
         key="doc_selector"
     )
 
-    st.session_state.selected_doc_id = doc_options[selected_display]
+    selected_doc = doc_options[selected_display]
+    st.session_state.selected_doc_id = selected_doc.doc_id if selected_doc else "ALL"
 
     # Show document details
-    if st.session_state.selected_doc_id != "ALL":
-        selected_doc = st.session_state.doc_manager.get_document(st.session_state.selected_doc_id)
-        if selected_doc:
-            st.sidebar.write(f"📄 **{selected_doc.filename}**")
-            st.sidebar.write(f"📅 Uploaded: {selected_doc.upload_date[:10]}")
-            st.sidebar.write(f"📊 {selected_doc.chunk_count} chunks")
-            st.sidebar.write(f"💾 {selected_doc.file_size:,} bytes")
-
-            # Delete button for selected document
-            if st.sidebar.button(f"🗑️ Delete {selected_doc.filename}"):
-                if delete_document_from_chromadb(selected_doc.doc_id):
-                    st.session_state.doc_manager.delete_document(selected_doc.doc_id)
-                    st.sidebar.success("Document deleted!")
-                    st.rerun()
-                else:
-                    st.sidebar.error("Failed to delete document")
+    if selected_doc:
+        st.sidebar.write(f"📄 **{selected_doc.filename}**")
+        st.sidebar.write(f"📅 Uploaded: {selected_doc.upload_date[:10]}")
+        st.sidebar.write(f"📊 {selected_doc.chunk_count} chunks")
+        st.sidebar.write(f"💾 {selected_doc.file_size:,} bytes")
+
+        # Delete button for selected document
+        if st.sidebar.button(f"🗑️ Delete {selected_doc.filename}"):
+            if delete_document_from_chromadb(selected_doc.doc_id):
+                st.session_state.doc_manager.delete_document(selected_doc.doc_id)
+                st.sidebar.success("Document deleted!")
+                st.rerun()
+            else:
+                st.sidebar.error("Failed to delete document")
 
     # Clear all button
     if st.sidebar.button("🗑️ Clear All Documents"):
+        ingestion_queue.cancel_all()
         clear_all_chromadb()
         st.session_state.doc_manager.clear_all()
         st.session_state.selected_doc_id = None
@@ -88,6 +151,10 @@ else:
     st.sidebar.write("No documents stored yet.")
     st.sidebar.write("👆 Upload a PDF to get started!")
 
+# The sidebar already holds the selected document; only look it up when there was no list to pick from
+if selected_doc is None and st.session_state.selected_doc_id not in (None, "ALL"):
+    selected_doc = st.session_state.doc_manager.get_document(st.session_state.selected_doc_id)
+
 # --- Main Area: Upload and Chat ---
 
 # --- Step 1: Upload PDF ---
@@ -95,34 +162,42 @@ st.header("📤 Upload New PDF")
 uploaded_file = st.file_uploader("Upload a PDF file", type=["pdf"])
 
 if uploaded_file:
+    # Large files are streamed: pages flow through an incremental hash and a
+    # generator-based chunker, so the full text is never held in memory
+    streaming_mode = st.checkbox(
+        "🌊 Streaming mode (bounded memory, for very large PDFs)",
+        value=uploaded_file.size > STREAMING_THRESHOLD_BYTES
+    )
+
     # --- Step 2: Extract Text from PDF ---
     text = ""
     try:
         # Read the uploaded file
-        pdf_bytes = uploaded_file.read()
-        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            page_text = page.get_text()
-            if page_text.strip():  # Only add non-empty pages
-                text += page_text + "\n"
+        pdf_bytes = uploaded_file.getvalue()
 
-        pdf_document.close()
+        if streaming_mode:
+            content_hash, text_size = st.session_state.doc_manager.generate_content_hash_streaming(
+                iter_pdf_pages(pdf_bytes)
+            )
+        else:
+            text = "".join(iter_pdf_pages(pdf_bytes))
+            # Hash and size come from a single encode of the text
+            content_hash, text_size = st.session_state.doc_manager.generate_content_hash_streaming([text])
 
     except Exception as e:
         st.error(f"Failed to read the PDF file: {e}")
         st.stop()
 
-    if not text.strip():
+    if not text_size:
         st.error("No text could be extracted from the PDF. Please check if the PDF contains readable text.")
         st.stop()
 
     # --- Step 3: Check for duplicates ---
-    content_hash = st.session_state.doc_manager.generate_content_hash(text)
     existing_doc = st.session_state.doc_manager.document_exists(content_hash)
 
-    if existing_doc:
+    if existing_doc and existing_doc.status == "pending":
+        st.info(f"⏳ This PDF is already being ingested as: **{existing_doc.filename}**")
+    elif existing_doc:
         st.info(f"📋 This PDF is already stored as: **{existing_doc.filename}**")
         st.info(f"Uploaded: {existing_doc.upload_date[:10]} | {existing_doc.chunk_count} chunks")
 
@@ -134,64 +209,66 @@ if uploaded_file:
         # --- Step 4: Process new document ---
         st.subheader("📄 New Document Detected")
 
-        # Show text preview
-        with st.expander("Preview extracted text"):
-            st.text_area("PDF Content", text[:1000] + "..." if len(text) > 1000 else text, height=200)
-
-        # Chunk the text - now using semantic chunking!
-        chunks = enhanced_chunk_text(text, method="semantic")
-
-        # Optional: Show comparison
-        if st.checkbox("🔬 Compare chunking methods"):
-            st.write("**Semantic Chunking** (new):")
-            semantic_chunks = enhanced_chunk_text(text, method="semantic")
-            st.write(f"Creates {len(semantic_chunks)} chunks")
-
-            st.write("**Original Chunking** (old):")
-            original_chunks = enhanced_chunk_text(text, method="original")
-            st.write(f"Creates {len(original_chunks)} chunks")
-
-            with st.expander("See first chunk comparison"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("**Semantic:**")
-                    st.write(semantic_chunks[0][:200] + "...")
-                with col2:
-                    st.write("**Original:**")
-                    st.write(original_chunks[0][:200] + "...")
-
-        st.write(f"📊 This will create **{len(chunks)} chunks**")
-
-        if st.checkbox("Show chunks preview"):
-            for i, chunk in enumerate(chunks[:3]):  # Show first 3 chunks
-                with st.expander(f"Chunk {i+1}"):
-                    st.write(chunk)
-            if len(chunks) > 3:
-                st.write(f"... and {len(chunks) - 3} more chunks")
+        if streaming_mode:
+            st.write(f"🌊 Streaming mode: **{text_size:,} bytes** of text will be chunked "
+                     f"and saved in batches of {STREAMING_BATCH_SIZE} chunks")
+
+            # Show only the first page so preview cost does not grow with the PDF
+            with st.expander("Preview first page"):
+                first_page = next(iter_pdf_pages(pdf_bytes), "")
+                st.text_area("PDF Content", first_page[:1000] + "..." if len(first_page) > 1000 else first_page, height=200)
+        else:
+            # Show text preview
+            with st.expander("Preview extracted text"):
+                st.text_area("PDF Content", text[:1000] + "..." if len(text) > 1000 else text, height=200)
+
+            # Chunk the text - now using semantic chunking!
+            chunks = enhanced_chunk_text(text, method="semantic")
+
+            # Optional: Show comparison
+            if st.checkbox("🔬 Compare chunking methods"):
+                st.write("**Semantic Chunking** (new):")
+                semantic_chunks = enhanced_chunk_text(text, method="semantic")
+                st.write(f"Creates {len(semantic_chunks)} chunks")
+
+                st.write("**Original Chunking** (old):")
+                original_chunks = enhanced_chunk_text(text, method="original")
+                st.write(f"Creates {len(original_chunks)} chunks")
+
+                with st.expander("See first chunk comparison"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write("**Semantic:**")
+                        st.write(semantic_chunks[0][:200] + "...")
+                    with col2:
+                        st.write("**Original:**")
+                        st.write(original_chunks[0][:200] + "...")
+
+            st.write(f"📊 This will create **{len(chunks)} chunks**")
+
+            if st.checkbox("Show chunks preview"):
+                for i, chunk in enumerate(chunks[:3]):  # Show first 3 chunks
+                    with st.expander(f"Chunk {i+1}"):
+                        st.write(chunk)
+                if len(chunks) > 3:
+                    st.write(f"... and {len(chunks) - 3} more chunks")
 
         # --- Step 5: Save new document ---
+        # Ingestion runs in the background, so the session stays usable meanwhile
         if st.button("💾 Save This PDF"):
-            with st.spinner("Processing and saving document..."):
-                try:
-                    # Add to document manager
-                    doc_id, is_new = st.session_state.doc_manager.add_document(
-                        uploaded_file.name, text, len(chunks)
-                    )
-
-                    if is_new:
-                        # Add to ChromaDB
-                        if add_document_to_chromadb(doc_id, chunks):
-                            st.success(f"✅ Saved: {uploaded_file.name}")
-                            st.success(f"📋 Document ID: {doc_id}")
-                            st.session_state.selected_doc_id = doc_id
-                            st.rerun()
-                        else:
-                            st.error("Failed to save to ChromaDB")
-                    else:
-                        st.info("Document already exists (this shouldn't happen)")
-
-                except Exception as e:
-                    st.error(f"❌ Failed to save document: {e}")
+            try:
+                doc_id, is_new = ingestion_queue.submit(
+                    uploaded_file.name, pdf_bytes, content_hash, text_size
+                )
+
+                if is_new:
+                    st.success(f"⏳ Queued: {uploaded_file.name} (it appears in the library once ingested)")
+                    st.success(f"📋 Document ID: {doc_id}")
+                else:
+                    st.info("Document already exists (this shouldn't happen)")
+
+            except Exception as e:
+                st.error(f"❌ Failed to queue document: {e}")
 
 # --- Step 6: Chat Interface ---
 if st.session_state.selected_doc_id:
@@ -200,14 +277,12 @@ if st.session_state.selected_doc_id:
     if st.session_state.selected_doc_id == "ALL":
         st.info("🔍 Searching across all documents")
         search_scope = None
+    elif selected_doc:
+        st.info(f"💬 Chatting with: **{selected_doc.filename}**")
+        search_scope = st.session_state.selected_doc_id
     else:
-        selected_doc = st.session_state.doc_manager.get_document(st.session_state.selected_doc_id)
-        if selected_doc:
-            st.info(f"💬 Chatting with: **{selected_doc.filename}**")
-            search_scope = st.session_state.selected_doc_id
-        else:
-            st.error("Selected document not found")
-            st.stop()
+        st.error("Selected document not found")
+        st.stop()
 
     # Chat input
     query = st.text_input("Ask a question about your document(s):")
@@ -241,7 +316,7 @@ if st.session_state.selected_doc_id:
             except Exception as e:
                 st.error(f"Error processing your question: {e}")
 
-elif existing_docs:
+elif total_docs:
     st.info("👈 Select a document from the sidebar to start chatting!")
 else:
     st.info("👆 Upload your first PDF to get started!")
@@ -251,21 +326,17 @@ st.markdown("---")
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    doc_count = len(existing_docs)
-    st.metric("📚 Documents", doc_count)
+    st.metric("📚 Documents", total_docs)
 
 with col2:
-    chromadb_docs = get_documents_in_chromadb()
-    chunk_count = sum(chromadb_docs.values())
+    chunk_count = st.session_state.doc_manager.total_chunk_count()
     st.metric("📊 Total Chunks", chunk_count)
 
 with col3:
     if st.session_state.selected_doc_id:
         if st.session_state.selected_doc_id == "ALL":
             st.metric("🎯 Search Scope", "All docs")
-        else:
-            selected_doc = st.session_state.doc_manager.get_document(st.session_state.selected_doc_id)
-            if selected_doc:
-                st.metric("🎯 Active Document", selected_doc.filename[:15] + "..." if len(selected_doc.filename) > 15 else selected_doc.filename)
+        elif selected_doc:
+            st.metric("🎯 Active Document", selected_doc.filename[:15] + "..." if len(selected_doc.filename) > 15 else selected_doc.filename)
     else:
         st.metric("🎯 Active Document", "None")
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Benchmark on-disk size and full-scan time with and without the chunk store
+
+Builds the same synthetic library twice in a temporary directory:
+    - "inline": chunk text stored in ChromaDB's documents field (the layout
+      before chunks.db existed), scanned with a plain collection.get()
+    - "chunk store": text zstd-compressed in chunks.db and ChromaDB holding
+      only ids, embeddings and metadata, scanned with
+      get_documents_in_chromadb and load_index
+
+For each it reports the size of chroma_db/ plus chunks.db and the median
+time of the chunk-count scan and of loading all chunk text. The
+per-document embedding matrices are not counted.
+
+Usage:
+    python benchmark_chunk_store.py --docs 200 --chunks-per-doc 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import vectorstore_utils
+from benchmark_sharding import RandomEmbeddingFunction, reset_vectorstore
+
+# Roughly the length of a 500-token chunk
+CHUNK_WORDS = 350
+
+def make_vocabulary(size: int = 3000):
+    rng = random.Random(1)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    return ["".join(rng.choices(letters[:18], k=rng.randint(2, 9))) for _ in range(size)]
+
+def make_chunk(vocabulary, rng) -> str:
+    """Pseudo-English text with a Zipf-like word distribution"""
+    words = rng.choices(vocabulary, weights=[1 / (i + 1) for i in range(len(vocabulary))], k=CHUNK_WORDS)
+    return " ".join(words).capitalize() + "."
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def median_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def count_chunks_inline(collection):
+    """The pre-chunk-store scan: every record's text comes back with its metadata"""
+    doc_counts = {}
+    for metadata in collection.get()['metadatas']:
+        doc_counts[metadata['doc_id']] = doc_counts.get(metadata['doc_id'], 0) + 1
+    return doc_counts
+
+def run(layout: str, library, repeats: int):
+    with tempfile.TemporaryDirectory() as path, contextlib.redirect_stdout(io.StringIO()):
+        reset_vectorstore(path, "none", 1)
+        collection = vectorstore_utils.collection
+
+        for doc_id, chunks in library:
+            if layout == "inline":
+                collection.add(
+                    ids=[f"{doc_id}_chunk_{i}" for i in range(len(chunks))],
+                    documents=chunks,
+                    embeddings=vectorstore_utils.embedding_function(chunks),
+                    metadatas=[{"doc_id": doc_id, "chunk_index": i} for i in range(len(chunks))]
+                )
+            else:
+                vectorstore_utils.add_document_to_chromadb(doc_id, chunks)
+
+        if layout == "inline":
+            count_ms = median_ms(lambda: count_chunks_inline(collection), repeats)
+            load_ms = median_ms(lambda: collection.get()['documents'], repeats)
+        else:
+            count_ms = median_ms(vectorstore_utils.get_documents_in_chromadb, repeats)
+            load_ms = median_ms(vectorstore_utils.load_index, repeats)
+
+        size = directory_size(f"{path}/chroma_db") + os.path.getsize(f"{path}/chunks.db")
+        return size, count_ms, load_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary()
+    library = [
+        (f"doc{i:06d}", [make_chunk(vocabulary, rng) for _ in range(args.chunks_per_doc)])
+        for i in range(args.docs)
+    ]
+    text_bytes = sum(len(chunk.encode('utf-8')) for _, chunks in library for chunk in chunks)
+    print(f"{args.docs} documents, {args.docs * args.chunks_per_doc} chunks, {text_bytes / 1e6:.1f} MB of text")
+
+    print(f"{'layout':<14}{'size MB':>10}{'count scan ms':>16}{'load text ms':>15}")
+    for layout in ("inline", "chunk store"):
+        size, count_ms, load_ms = run(layout, library, args.repeats)
+        print(f"{layout:<14}{size / 1e6:>10.1f}{count_ms:>16.2f}{load_ms:>15.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark query latency and delete cost for each ChromaDB sharding mode
+
+Builds throwaway libraries of increasing size in a temporary directory and,
+for every mode ("none", "document", "hash"), measures:
+    - median latency of search_in_document scoped to one document, answered
+      from the per-document embedding matrix as in normal use
+    - the same scoped query with the matrices removed, i.e. the ChromaDB
+      path only taken for documents ingested before the matrices existed
+    - median latency of an unscoped "Search all documents" query
+    - median cost of delete_document_from_chromadb
+
+Random unit vectors stand in for the embedding model so the numbers reflect
+the vector store alone. Sharding only affects the legacy scoped column, the
+all-documents fan-out and deletes; the matrix column is shown for reference.
+
+Usage:
+    python benchmark_sharding.py --sizes 50 200 800 --chunks-per-doc 20
+"""
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import tempfile
+import time
+import hashlib
+import numpy as np
+import chromadb
+
+import vectorstore_utils
+from chunk_store import ChunkStore
+from embedding_store import EmbeddingMatrixStore
+from shard_registry import ShardRegistry
+
+EMBEDDING_DIM = 384
+
+class RandomEmbeddingFunction(chromadb.EmbeddingFunction):
+    """Deterministic random unit vectors, seeded by the text"""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            seed = int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+            embeddings.append(vector / np.linalg.norm(vector))
+        return embeddings
+
+    @staticmethod
+    def name():
+        return "benchmark_random"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return RandomEmbeddingFunction()
+
+def reset_vectorstore(path: str, mode: str, shard_count: int):
+    """Point vectorstore_utils at a fresh store under path"""
+    vectorstore_utils.SHARDING_MODE = mode
+    vectorstore_utils.SHARD_COUNT = shard_count
+    vectorstore_utils.shards = {}
+    vectorstore_utils.client = chromadb.PersistentClient(path=f"{path}/chroma_db")
+    vectorstore_utils.embedding_function = RandomEmbeddingFunction()
+    vectorstore_utils.collection = vectorstore_utils.client.get_or_create_collection(
+        name="pdf_chunks", embedding_function=vectorstore_utils.embedding_function
+    )
+    vectorstore_utils.chunk_store = ChunkStore(f"{path}/chunks.db")
+    vectorstore_utils.embedding_store = EmbeddingMatrixStore(f"{path}/doc_embeddings")
+    vectorstore_utils.shard_registry = ShardRegistry(f"{path}/shards.db")
+
+def median_ms(timings):
+    return statistics.median(timings) * 1000
+
+def run(mode: str, doc_count: int, chunks_per_doc: int, shard_count: int, queries: int, deletes: int):
+    # vectorstore_utils logs every add and delete; keep the report readable
+    with tempfile.TemporaryDirectory() as path, contextlib.redirect_stdout(io.StringIO()):
+        reset_vectorstore(path, mode, shard_count)
+
+        doc_ids = [f"doc{i:06d}" for i in range(doc_count)]
+        for doc_id in doc_ids:
+            chunks = [f"{doc_id} chunk {j} text" for j in range(chunks_per_doc)]
+            vectorstore_utils.add_document_to_chromadb(doc_id, chunks)
+
+        def time_scoped():
+            timings = []
+            for i in range(queries):
+                start = time.perf_counter()
+                vectorstore_utils.search_in_document(f"query {i}", doc_id=random.choice(doc_ids), top_k=5)
+                timings.append(time.perf_counter() - start)
+            return timings
+
+        matrix_scoped = time_scoped()
+        vectorstore_utils.embedding_store.clear_all()
+        legacy_scoped = time_scoped()
+
+        unscoped = []
+        for i in range(queries):
+            query = f"query {i}"
+            start = time.perf_counter()
+            vectorstore_utils.search_in_document(query, top_k=5)
+            unscoped.append(time.perf_counter() - start)
+
+        deleted = []
+        for doc_id in random.sample(doc_ids, min(deletes, doc_count)):
+            start = time.perf_counter()
+            vectorstore_utils.delete_document_from_chromadb(doc_id)
+            deleted.append(time.perf_counter() - start)
+
+        return median_ms(matrix_scoped), median_ms(legacy_scoped), median_ms(unscoped), median_ms(deleted)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 800], help="Library sizes in documents")
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--shard-count", type=int, default=16, help="Buckets for hash sharding")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--deletes", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["none", "document", "hash"])
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'mode':<10}{'docs':>8}{'matrix scoped ms':>18}{'legacy scoped ms':>18}{'all-docs ms':>14}{'delete ms':>12}")
+    for doc_count in args.sizes:
+        for mode in args.modes:
+            matrix_scoped, legacy_scoped, unscoped, deleted = run(
+                mode, doc_count, args.chunks_per_doc, args.shard_count, args.queries, args.deletes
+            )
+            print(f"{mode:<10}{doc_count:>8}{matrix_scoped:>18.2f}{legacy_scoped:>18.2f}{unscoped:>14.2f}{deleted:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sqlite3
+import hashlib
+import zstandard
+from typing import Dict, Iterable, List
+
+# SQLite's default limit on host parameters per statement is 999
+_SQLITE_MAX_PARAMS = 900
+
+class ChunkStore:
+    """Content-addressed, zstd-compressed storage for chunk text
+
+    ChromaDB only keeps ids, embeddings and metadata; the chunk text lives
+    here, keyed by its SHA256 hash. Identical chunks are stored once and
+    reference-counted so deleting one document never removes text that
+    another document still uses.
+    """
+
+    def __init__(self, db_path: str = "./chunks.db", compression_level: int = 3):
+        self.db_path = db_path
+        self.compression_level = compression_level
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize the SQLite database"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                content_hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                ref_count INTEGER NOT NULL
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Generate SHA256 hash of chunk text"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def put_many(self, texts: List[str]) -> List[str]:
+        """
+        Store chunk texts, compressing any that are not stored yet
+
+        Returns:
+            Content hashes in the same order as texts
+        """
+        compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        hashes = [self.hash_text(text) for text in texts]
+        rows = [
+            (content_hash, compressor.compress(text.encode('utf-8')))
+            for content_hash, text in zip(hashes, texts)
+        ]
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT INTO chunks (content_hash, data, ref_count) VALUES (?, ?, 1)
+            ON CONFLICT(content_hash) DO UPDATE SET ref_count = ref_count + 1
+        ''', rows)
+
+        conn.commit()
+        conn.close()
+
+        return hashes
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Fetch chunk texts in bulk
+
+        Returns:
+            Dictionary mapping content hash to text; unknown hashes are omitted
+        """
+        unique_hashes = list(dict.fromkeys(hashes))
+        decompressor = zstandard.ZstdDecompressor()
+        texts = {}
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        for start in range(0, len(unique_hashes), _SQLITE_MAX_PARAMS):
+            batch = unique_hashes[start:start + _SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(
+                f"SELECT content_hash, data FROM chunks WHERE content_hash IN ({placeholders})",
+                batch
+            )
+            for content_hash, data in cursor.fetchall():
+                texts[content_hash] = decompressor.decompress(data).decode('utf-8')
+
+        conn.close()
+
+        return texts
+
+    def release_many(self, hashes: Iterable[str]):
+        """Drop one reference per hash, deleting text that is no longer used"""
+        hashes = list(hashes)
+        released = list(dict.fromkeys(hashes))
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            'UPDATE chunks SET ref_count = ref_count - 1 WHERE content_hash = ?',
+            [(content_hash,) for content_hash in hashes]
+        )
+        # Only the rows just released can have reached zero; look them up by key
+        for start in range(0, len(released), _SQLITE_MAX_PARAMS):
+            batch = released[start:start + _SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(
+                f"DELETE FROM chunks WHERE content_hash IN ({placeholders}) AND ref_count <= 0",
+                batch
+            )
+
+        conn.commit()
+        conn.close()
+
+    def clear_all(self):
+        """Clear all stored chunk text"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM chunks')
+        conn.commit()
+        conn.close()
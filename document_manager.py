@@ -1,7 +1,7 @@
 import sqlite3
 import hashlib
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
 @dataclass
@@ -13,6 +13,7 @@ class DocumentInfo:
     upload_date: str
     chunk_count: int
     file_size: int
+    status: str = "ready"  # "pending" while its vectors are still being ingested
 
 class DocumentManager:
     """Manages document metadata and prevents duplicates"""
@@ -33,10 +34,20 @@ class DocumentManager:
                 content_hash TEXT UNIQUE NOT NULL,
                 upload_date TEXT NOT NULL,
                 chunk_count INTEGER NOT NULL,
-                file_size INTEGER NOT NULL
+                file_size INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'ready'
             )
         ''')
 
+        # Databases created before background ingestion lack the status column
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(documents)')]
+        if 'status' not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN status TEXT NOT NULL DEFAULT 'ready'")
+
+        # Indexes for paging the library by date and searching by filename prefix
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_upload_date ON documents (upload_date, doc_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename COLLATE NOCASE)')
+
         conn.commit()
         conn.close()
 
@@ -44,6 +55,23 @@ class DocumentManager:
         """Generate SHA256 hash of document content"""
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
+    def generate_content_hash_streaming(self, pieces: Iterable[str]) -> Tuple[str, int]:
+        """
+        Hash document content piece by piece without holding it in memory
+
+        Produces the same hash as generate_content_hash on the joined pieces.
+
+        Returns:
+            (content_hash, file_size) - hex digest and UTF-8 size in bytes
+        """
+        hasher = hashlib.sha256()
+        file_size = 0
+        for piece in pieces:
+            encoded = piece.encode('utf-8')
+            hasher.update(encoded)
+            file_size += len(encoded)
+        return hasher.hexdigest(), file_size
+
     def generate_doc_id(self, filename: str, content_hash: str) -> str:
         """Generate unique document ID"""
         # Use first 8 chars of hash + sanitized filename
@@ -51,12 +79,12 @@ class DocumentManager:
         return f"{content_hash[:8]}_{sanitized_filename}"
 
     def document_exists(self, content_hash: str) -> Optional[DocumentInfo]:
-        """Check if document with this content hash already exists"""
+        """Check if document with this content hash already exists (ready or still pending)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size
+            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size, status
             FROM documents WHERE content_hash = ?
         ''', (content_hash,))
 
@@ -74,8 +102,22 @@ class DocumentManager:
         Returns:
             (doc_id, is_new) - doc_id and whether this is a new document
         """
-        content_hash = self.generate_content_hash(content)
+        encoded = content.encode('utf-8')
+        content_hash = hashlib.sha256(encoded).hexdigest()
+        return self.add_document_by_hash(filename, content_hash, len(encoded), chunk_count)
+
+    def add_document_by_hash(self, filename: str, content_hash: str, file_size: int,
+                             chunk_count: int, status: str = "ready") -> Tuple[str, bool]:
+        """
+        Add document to database from a precomputed hash and size
+
+        Used by streaming ingestion, where the full text is never held in memory.
+        Documents added as "pending" are hidden from listings until
+        mark_document_ready is called.
 
+        Returns:
+            (doc_id, is_new) - doc_id and whether this is a new document
+        """
         # Check if document already exists
         existing = self.document_exists(content_hash)
         if existing:
@@ -84,16 +126,15 @@ class DocumentManager:
         # Add new document
         doc_id = self.generate_doc_id(filename, content_hash)
         upload_date = datetime.now().isoformat()
-        file_size = len(content.encode('utf-8'))
 
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         try:
             cursor.execute('''
-                INSERT INTO documents (doc_id, filename, content_hash, upload_date, chunk_count, file_size)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (doc_id, filename, content_hash, upload_date, chunk_count, file_size))
+                INSERT INTO documents (doc_id, filename, content_hash, upload_date, chunk_count, file_size, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (doc_id, filename, content_hash, upload_date, chunk_count, file_size, status))
 
             conn.commit()
             conn.close()
@@ -102,17 +143,16 @@ class DocumentManager:
         except sqlite3.IntegrityError:
             # Handle case where doc_id already exists (very unlikely)
             conn.close()
-            doc_id = f"{content_hash[:12]}_{sanitized_filename}"
-            return self.add_document(f"copy_{filename}", content, chunk_count)
+            return self.add_document_by_hash(f"copy_{filename}", content_hash, file_size, chunk_count, status)
 
     def list_documents(self) -> List[DocumentInfo]:
-        """List all documents"""
+        """List all ready documents"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size
-            FROM documents ORDER BY upload_date DESC
+            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size, status
+            FROM documents WHERE status = 'ready' ORDER BY upload_date DESC
         ''')
 
         results = cursor.fetchall()
@@ -120,23 +160,103 @@ class DocumentManager:
 
         return [DocumentInfo(*row) for row in results]
 
+    @staticmethod
+    def _filename_filter(search: Optional[str]) -> Tuple[str, tuple]:
+        """Build a WHERE clause for ready documents whose filename starts with search (case-insensitive)"""
+        if not search:
+            return "WHERE status = 'ready'", ()
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return "WHERE status = 'ready' AND filename LIKE ? ESCAPE '\\'", (escaped + "%",)
+
+    def count_documents(self, search: Optional[str] = None) -> int:
+        """Count ready documents, optionally only those whose filename starts with search"""
+        where_clause, params = self._filename_filter(search)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(f'SELECT COUNT(*) FROM documents {where_clause}', params)
+
+        count = cursor.fetchone()[0]
+        conn.close()
+
+        return count
+
+    def list_documents_page(self, search: Optional[str] = None, limit: int = 20,
+                            offset: int = 0) -> List[DocumentInfo]:
+        """
+        List one page of ready documents, newest first
+
+        Args:
+            search: Optional case-insensitive filename prefix
+            limit: Maximum number of documents to return
+            offset: Number of matching documents to skip
+
+        Returns:
+            Documents on the requested page
+        """
+        where_clause, params = self._filename_filter(search)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(f'''
+            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size, status
+            FROM documents {where_clause}
+            ORDER BY upload_date DESC, doc_id DESC
+            LIMIT ? OFFSET ?
+        ''', params + (limit, offset))
+
+        results = cursor.fetchall()
+        conn.close()
+
+        return [DocumentInfo(*row) for row in results]
+
+    def total_chunk_count(self) -> int:
+        """Total number of chunks across all ready documents"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM documents WHERE status = 'ready'")
+
+        total = cursor.fetchone()[0]
+        conn.close()
+
+        return total
+
     def get_document(self, doc_id: str) -> Optional[DocumentInfo]:
-        """Get document by ID"""
+        """Get a ready document by ID"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size
+            SELECT doc_id, filename, content_hash, upload_date, chunk_count, file_size, status
             FROM documents WHERE doc_id = ?
         ''', (doc_id,))
 
         result = cursor.fetchone()
         conn.close()
 
-        if result:
+        if result and result[-1] == 'ready':
             return DocumentInfo(*result)
         return None
 
+    def mark_document_ready(self, doc_id: str, chunk_count: int) -> bool:
+        """Expose a pending document once all of its vectors are committed"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "UPDATE documents SET chunk_count = ?, status = 'ready' WHERE doc_id = ?",
+            (chunk_count, doc_id)
+        )
+        updated = cursor.rowcount > 0
+
+        conn.commit()
+        conn.close()
+
+        return updated
+
     def delete_document(self, doc_id: str) -> bool:
         """Delete document from metadata"""
         conn = sqlite3.connect(self.db_path)
@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import shutil
+import numpy as np
+from typing import List, Optional
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+class EmbeddingMatrixStore:
+    """Per-document embedding matrices stored as memory-mapped arrays
+
+    Each document gets a directory holding its chunk embeddings row by row
+    (in chunk_index order), optionally quantized to float16 or int8, plus the
+    content hash of every row. Directories are named by a hash of the
+    document ID so long or non-ASCII filenames stay within NAME_MAX. Scoped
+    searches read the matrix through np.memmap and score every row exactly,
+    so only the pages being scanned are resident and no index has to be
+    traversed.
+
+    Files per document:
+        meta.json   - dtype, dim and row count
+        vectors.bin - embeddings in the stored dtype
+        scales.bin  - float32 per-row scale (int8 only)
+        norms.bin   - float32 squared L2 norm of each original row
+        hashes.bin  - 64-byte content hash of each row
+    """
+
+    def __init__(self, root: str = "./doc_embeddings", dtype: str = "float32",
+                 block_rows: int = 4096):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype {dtype!r}, expected one of {SUPPORTED_DTYPES}")
+        self.root = root
+        self.dtype = dtype
+        self.block_rows = block_rows
+        os.makedirs(self.root, exist_ok=True)
+
+    def _doc_dir(self, doc_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(doc_id.encode('utf-8')).hexdigest())
+
+    def _read_meta(self, doc_id: str) -> Optional[dict]:
+        meta_path = os.path.join(self._doc_dir(doc_id), "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def has_document(self, doc_id: str) -> bool:
+        """Check whether a matrix exists for this document"""
+        return self._read_meta(doc_id) is not None
+
+    def append(self, doc_id: str, embeddings: np.ndarray, content_hashes: List[str]):
+        """
+        Append rows to a document's matrix, creating it if needed
+
+        Args:
+            doc_id: Document identifier
+            embeddings: float32 array of shape (rows, dim)
+            content_hashes: Chunk store hash for each row
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        doc_dir = self._doc_dir(doc_id)
+        os.makedirs(doc_dir, exist_ok=True)
+
+        # An existing matrix keeps the dtype it was created with
+        meta = self._read_meta(doc_id) or {"dtype": self.dtype, "dim": embeddings.shape[1], "rows": 0}
+        if embeddings.shape[1] != meta["dim"]:
+            raise ValueError(f"Embedding dim {embeddings.shape[1]} does not match stored dim {meta['dim']}")
+
+        if meta["dtype"] == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.round(embeddings / scales[:, None]).astype(np.int8)
+            with open(os.path.join(doc_dir, "scales.bin"), "ab") as f:
+                f.write(scales.astype(np.float32).tobytes())
+        else:
+            stored = embeddings.astype(meta["dtype"])
+
+        with open(os.path.join(doc_dir, "vectors.bin"), "ab") as f:
+            f.write(stored.tobytes())
+        with open(os.path.join(doc_dir, "norms.bin"), "ab") as f:
+            f.write(np.einsum("ij,ij->i", embeddings, embeddings).astype(np.float32).tobytes())
+        with open(os.path.join(doc_dir, "hashes.bin"), "ab") as f:
+            f.write(np.array(content_hashes, dtype="S64").tobytes())
+
+        # Rows only become visible to readers once meta.json is rewritten
+        meta["rows"] += len(stored)
+        tmp_path = os.path.join(doc_dir, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(doc_dir, "meta.json"))
+
+    def search(self, doc_id: str, query_embedding: np.ndarray, top_k: int = 3) -> Optional[List[str]]:
+        """
+        Exact nearest-neighbour search over one document's matrix
+
+        Rows are ranked by L2 distance, matching ChromaDB's default space.
+        With float32 storage the result is identical to exact search.
+
+        Returns:
+            Content hashes of the top_k rows, nearest first, or None if the
+            document has no stored matrix
+        """
+        meta = self._read_meta(doc_id)
+        if meta is None:
+            return None
+        rows, dim = meta["rows"], meta["dim"]
+        if rows == 0:
+            return []
+
+        doc_dir = self._doc_dir(doc_id)
+        vectors = np.memmap(os.path.join(doc_dir, "vectors.bin"), dtype=meta["dtype"], mode="r", shape=(rows, dim))
+        norms = np.memmap(os.path.join(doc_dir, "norms.bin"), dtype=np.float32, mode="r", shape=(rows,))
+        scales = None
+        if meta["dtype"] == "int8":
+            scales = np.memmap(os.path.join(doc_dir, "scales.bin"), dtype=np.float32, mode="r", shape=(rows,))
+
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(dim)
+        k = min(top_k, rows)
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+
+        # Score block by block so only block_rows rows are paged in at a time;
+        # ||x - q||^2 ranks the same as ||x||^2 - 2 x.q
+        for start in range(0, rows, self.block_rows):
+            end = min(start + self.block_rows, rows)
+            block = vectors[start:end]
+            # Quantized blocks are widened for the dot product; float32 is used in place
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            dots = block @ query
+            if scales is not None:
+                dots *= scales[start:end]
+            scores = norms[start:end] - 2.0 * dots
+
+            block_best = np.argpartition(scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[block_best]])
+            best_rows = np.concatenate([best_rows, block_best + start])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, k - 1)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+
+        order = np.argsort(best_scores, kind="stable")
+        hashes = np.memmap(os.path.join(doc_dir, "hashes.bin"), dtype="S64", mode="r", shape=(rows,))
+        return [hashes[i].decode("ascii") for i in best_rows[order]]
+
+    def delete(self, doc_id: str):
+        """Remove a document's matrix"""
+        shutil.rmtree(self._doc_dir(doc_id), ignore_errors=True)
+
+    def clear_all(self):
+        """Remove all stored matrices"""
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
@@ -0,0 +1,293 @@
+import os
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+from dataclasses import dataclass
+
+from document_manager import DocumentManager
+from utils import iter_pdf_pages, stream_semantic_chunks
+from vectorstore_utils import (
+    add_document_to_chromadb_streaming,
+    delete_document_from_chromadb,
+    initialize_chromadb,
+    publish_document_in_chromadb
+)
+
+# Job states; queued and running jobs are "active"
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Average UTF-8 size of a semantic chunk, used to estimate a job's chunk total
+# up front instead of chunking the whole PDF twice
+ESTIMATED_CHUNK_BYTES = 1500
+
+@dataclass
+class JobInfo:
+    """Ingestion job state"""
+    job_id: str
+    doc_id: str
+    filename: str
+    status: str
+    chunks_done: int
+    chunks_total: int
+    error: Optional[str]
+    created_at: str
+    updated_at: str
+
+class IngestionQueue:
+    """Background PDF ingestion backed by a jobs table in the document database
+
+    Uploaded PDFs are spooled to disk and processed by a fixed-size pool of
+    worker threads, so at most max_workers documents are embedded at once
+    while the Streamlit session stays responsive. The document row is
+    created as "pending" on submit and only becomes visible through
+    DocumentManager once all of its vectors are committed.
+    """
+
+    def __init__(self, doc_manager: DocumentManager, max_workers: int = 2,
+                 spool_dir: str = "./ingest_spool", batch_size: int = 256,
+                 window_chars: int = 200_000):
+        self.doc_manager = doc_manager
+        self.db_path = doc_manager.db_path
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.window_chars = window_chars
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Set up the shared ChromaDB globals before any worker thread touches them
+        initialize_chromadb()
+        self._init_database()
+        self._resume_jobs()
+
+    def _init_database(self):
+        """Initialize the jobs table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                job_id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                chunks_total INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status)')
+
+        conn.commit()
+        conn.close()
+
+    def _spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.pdf")
+
+    def _update_job(self, job_id: str, only_if_status: Optional[str] = None, **fields) -> bool:
+        """Update job columns, optionally only while the job is still in a given state"""
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        params = list(fields.values()) + [job_id]
+        condition = "job_id = ?"
+        if only_if_status:
+            condition += " AND status = ?"
+            params.append(only_if_status)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(f'UPDATE ingestion_jobs SET {assignments} WHERE {condition}', params)
+        updated = cursor.rowcount > 0
+
+        conn.commit()
+        conn.close()
+
+        return updated
+
+    def _discard_job(self, job: JobInfo):
+        """Remove everything a cancelled or failed job may have left behind"""
+        delete_document_from_chromadb(job.doc_id)
+        self.doc_manager.delete_document(job.doc_id)
+        spool_path = self._spool_path(job.job_id)
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+    def _resume_jobs(self):
+        """Clean up jobs cancelled mid-run and restart jobs interrupted by a previous shutdown"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Cancelled while running, but the server stopped before the worker
+        # cleaned up; skip documents that a newer job is ingesting again
+        cursor.execute('''
+            SELECT j.job_id, j.doc_id, j.filename, j.status, j.chunks_done, j.chunks_total,
+                   j.error, j.created_at, j.updated_at
+            FROM ingestion_jobs j JOIN documents d ON d.doc_id = j.doc_id
+            WHERE j.status = ? AND d.status = 'pending'
+              AND NOT EXISTS (
+                  SELECT 1 FROM ingestion_jobs a WHERE a.doc_id = j.doc_id AND a.status IN (?, ?)
+              )
+        ''', (CANCELLED, QUEUED, RUNNING))
+
+        abandoned = [JobInfo(*row) for row in cursor.fetchall()]
+        conn.close()
+
+        for job in abandoned:
+            self._discard_job(job)
+
+        for job in self.list_active_jobs():
+            # Whatever a half-finished run wrote is discarded; the job restarts from scratch
+            delete_document_from_chromadb(job.doc_id)
+            if os.path.exists(self._spool_path(job.job_id)):
+                self._update_job(job.job_id, status=QUEUED, chunks_done=0)
+                self.executor.submit(self._run_job, job.job_id)
+            else:
+                self._update_job(job.job_id, status=FAILED, error="Uploaded file is no longer available")
+                self.doc_manager.delete_document(job.doc_id)
+
+    def submit(self, filename: str, pdf_bytes: bytes, content_hash: str, file_size: int) -> Tuple[str, bool]:
+        """
+        Queue a PDF for background ingestion
+
+        Returns:
+            (doc_id, is_new) - doc_id and whether a new job was queued
+        """
+        doc_id, is_new = self.doc_manager.add_document_by_hash(
+            filename, content_hash, file_size, 0, status="pending"
+        )
+        if not is_new:
+            return doc_id, False
+
+        job_id = uuid.uuid4().hex
+        with open(self._spool_path(job_id), "wb") as f:
+            f.write(pdf_bytes)
+
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO ingestion_jobs (job_id, doc_id, filename, status, chunks_total, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, doc_id, filename, QUEUED, max(1, file_size // ESTIMATED_CHUNK_BYTES), now, now))
+
+        conn.commit()
+        conn.close()
+
+        self.executor.submit(self._run_job, job_id)
+        return doc_id, True
+
+    def get_job(self, job_id: str) -> Optional[JobInfo]:
+        """Get job by ID"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT job_id, doc_id, filename, status, chunks_done, chunks_total, error, created_at, updated_at
+            FROM ingestion_jobs WHERE job_id = ?
+        ''', (job_id,))
+
+        result = cursor.fetchone()
+        conn.close()
+
+        if result:
+            return JobInfo(*result)
+        return None
+
+    def list_active_jobs(self) -> List[JobInfo]:
+        """List queued and running jobs, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT job_id, doc_id, filename, status, chunks_done, chunks_total, error, created_at, updated_at
+            FROM ingestion_jobs WHERE status IN (?, ?) ORDER BY created_at
+        ''', (QUEUED, RUNNING))
+
+        results = cursor.fetchall()
+        conn.close()
+
+        return [JobInfo(*row) for row in results]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job
+
+        A queued job is cleaned up immediately since no worker owns it yet;
+        a running job stops and cleans up after its current batch.
+        """
+        if self._update_job(job_id, only_if_status=QUEUED, status=CANCELLED):
+            self._discard_job(self.get_job(job_id))
+            return True
+        return self._update_job(job_id, only_if_status=RUNNING, status=CANCELLED)
+
+    def cancel_all(self):
+        """Request cancellation of every active job"""
+        for job in self.list_active_jobs():
+            self.cancel(job.job_id)
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        job = self.get_job(job_id)
+        return job is None or job.status == CANCELLED
+
+    def _run_job(self, job_id: str):
+        """Worker entry point: chunk, embed and store one spooled PDF"""
+        job = self.get_job(job_id)
+        spool_path = self._spool_path(job_id)
+
+        try:
+            if job is None or not self._update_job(job_id, only_if_status=QUEUED, status=RUNNING):
+                # Cancelled before a worker picked it up; cancel() already cleaned up
+                return
+
+            def report_progress(chunks_done: int) -> bool:
+                # The total starts as an estimate from the text size; raise it if the document runs longer
+                self._update_job(job_id, only_if_status=RUNNING, chunks_done=chunks_done,
+                                 chunks_total=max(job.chunks_total, chunks_done))
+                return not self._is_cancelled(job_id)
+
+            # Chunks stay flagged as pending, and out of unscoped searches, until published
+            chunk_count = add_document_to_chromadb_streaming(
+                job.doc_id,
+                stream_semantic_chunks(iter_pdf_pages(spool_path), window_chars=self.window_chars),
+                batch_size=self.batch_size,
+                progress_callback=report_progress,
+                pending=True
+            )
+
+            # Completing is conditional so a late cancel is never overwritten
+            if chunk_count is not None and self._update_job(
+                job_id, only_if_status=RUNNING, status=COMPLETED,
+                chunks_done=chunk_count, chunks_total=chunk_count
+            ):
+                if publish_document_in_chromadb(job.doc_id, chunk_count, self.batch_size):
+                    self.doc_manager.mark_document_ready(job.doc_id, chunk_count)
+                    print(f"Ingestion job {job_id} completed for document {job.doc_id}")
+                    return
+                self._update_job(job_id, status=FAILED, error="Failed to publish document in ChromaDB")
+                self._discard_job(job)
+                return
+
+            # Cancelled or failed: nothing of this document may stay behind
+            delete_document_from_chromadb(job.doc_id)
+            self.doc_manager.delete_document(job.doc_id)
+            self._update_job(job_id, only_if_status=RUNNING, status=FAILED,
+                             error="Failed to save to ChromaDB")
+
+        except Exception as e:
+            print(f"Error in ingestion job {job_id}: {e}")
+            delete_document_from_chromadb(job.doc_id)
+            self.doc_manager.delete_document(job.doc_id)
+            self._update_job(job_id, only_if_status=RUNNING, status=FAILED, error=str(e))
+
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
@@ -0,0 +1,70 @@
+import sqlite3
+from typing import Optional
+
+class ShardRegistry:
+    """Records which ChromaDB collection holds each document's chunks
+
+    The shard is chosen from the sharding settings when a document is first
+    written and stored here, so scoped queries and deletes keep finding the
+    document after CHROMA_SHARDING or CHROMA_SHARD_COUNT change.
+    """
+
+    def __init__(self, db_path: str = "./shards.db"):
+        self.db_path = db_path
+        self._init_database()
+
+    def _init_database(self):
+        """Initialize the SQLite database"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_shards (
+                doc_id TEXT PRIMARY KEY,
+                shard TEXT NOT NULL
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def get_shard(self, doc_id: str) -> Optional[str]:
+        """Get the collection name recorded for a document"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT shard FROM document_shards WHERE doc_id = ?', (doc_id,))
+
+        result = cursor.fetchone()
+        conn.close()
+
+        return result[0] if result else None
+
+    def set_shard(self, doc_id: str, shard: str):
+        """Record the collection holding a document's chunks"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO document_shards (doc_id, shard) VALUES (?, ?)
+            ON CONFLICT(doc_id) DO UPDATE SET shard = excluded.shard
+        ''', (doc_id, shard))
+
+        conn.commit()
+        conn.close()
+
+    def delete_shard(self, doc_id: str):
+        """Forget where a document was stored"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM document_shards WHERE doc_id = ?', (doc_id,))
+        conn.commit()
+        conn.close()
+
+    def clear_all(self):
+        """Clear all recorded shards"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM document_shards')
+        conn.commit()
+        conn.close()
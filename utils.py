@@ -2,10 +2,12 @@ import os
 import numpy as np
 import tiktoken
 import re
+import fitz  # PyMuPDF
 from openai import OpenAI
 from dotenv import load_dotenv
 import streamlit as st
-from typing import List
+from typing import Iterable, Iterator, List
+from vectorstore_utils import resolve_chunk_texts
 
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -60,12 +62,15 @@ def semantic_chunk_text(text: str, max_tokens: int = 500, min_tokens: int = 100)
     Returns:
         List of semantically coherent chunks
     """
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-
     # Step 1: Split into paragraphs (natural boundaries)
     paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
 
-    chunks = []
+    return list(_chunk_paragraphs(paragraphs, max_tokens, min_tokens))
+
+def _chunk_paragraphs(paragraphs: Iterable[str], max_tokens: int, min_tokens: int) -> Iterator[str]:
+    """Group paragraphs into chunks, yielding each chunk as soon as it is complete"""
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+
     current_chunk = []
     current_tokens = 0
 
@@ -83,7 +88,7 @@ def semantic_chunk_text(text: str, max_tokens: int = 500, min_tokens: int = 100)
                 # If adding this sentence would exceed limit, finalize current chunk
                 if current_tokens + sentence_tokens > max_tokens and current_chunk:
                     if current_tokens >= min_tokens:  # Only add if chunk is substantial
-                        chunks.append(' '.join(current_chunk))
+                        yield ' '.join(current_chunk)
                     current_chunk = [sentence]
                     current_tokens = sentence_tokens
                 else:
@@ -93,7 +98,7 @@ def semantic_chunk_text(text: str, max_tokens: int = 500, min_tokens: int = 100)
         # If adding this paragraph would exceed limit, finalize current chunk
         elif current_tokens + para_tokens > max_tokens and current_chunk:
             if current_tokens >= min_tokens:
-                chunks.append(' '.join(current_chunk))
+                yield ' '.join(current_chunk)
             current_chunk = [paragraph]
             current_tokens = para_tokens
         else:
@@ -102,9 +107,74 @@ def semantic_chunk_text(text: str, max_tokens: int = 500, min_tokens: int = 100)
 
     # Add final chunk if it exists and meets minimum size
     if current_chunk and current_tokens >= min_tokens:
-        chunks.append(' '.join(current_chunk))
+        yield ' '.join(current_chunk)
 
-    return chunks
+def _iter_paragraphs(pieces: Iterable[str], window_chars: int) -> Iterator[str]:
+    """
+    Re-split a stream of text pieces on blank lines
+
+    Only the trailing, still-open paragraph is buffered. If it grows beyond
+    window_chars it is flushed as-is, which keeps memory bounded even for
+    text without paragraph breaks.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        parts = buffer.split('\n\n')
+        buffer = parts.pop()
+        if len(buffer) > window_chars:
+            parts.append(buffer)
+            buffer = ""
+        for part in parts:
+            if part.strip():
+                yield part.strip()
+
+    if buffer.strip():
+        yield buffer.strip()
+
+def stream_semantic_chunks(pieces: Iterable[str], max_tokens: int = 500, min_tokens: int = 100,
+                           window_chars: int = 200_000) -> Iterator[str]:
+    """
+    Streaming version of semantic_chunk_text
+
+    Consumes text piece by piece (e.g. one PDF page at a time) and yields
+    chunks as they are completed, so the full document text is never held
+    in memory. Produces the same chunks as semantic_chunk_text on the joined
+    text unless a single paragraph exceeds window_chars.
+
+    Args:
+        pieces: Iterable of text pieces, in document order
+        max_tokens: Maximum tokens per chunk
+        min_tokens: Minimum tokens per chunk (prevents tiny fragments)
+        window_chars: Maximum characters buffered for an unfinished paragraph
+
+    Returns:
+        Iterator over text chunks
+    """
+    return _chunk_paragraphs(_iter_paragraphs(pieces, window_chars), max_tokens, min_tokens)
+
+def iter_pdf_pages(pdf_source) -> Iterator[str]:
+    """
+    Yield the text of each non-empty PDF page, followed by a newline
+
+    Args:
+        pdf_source: PDF bytes, a file-like buffer or a path on disk
+
+    Returns:
+        Iterator over page texts; joining them gives the full document text
+    """
+    if isinstance(pdf_source, str):
+        pdf_document = fitz.open(pdf_source)
+    else:
+        pdf_document = fitz.open(stream=pdf_source, filetype="pdf")
+
+    try:
+        for page_num in range(pdf_document.page_count):
+            page_text = pdf_document[page_num].get_text()
+            if page_text.strip():  # Only add non-empty pages
+                yield page_text + "\n"
+    finally:
+        pdf_document.close()
 
 def enhanced_chunk_text(text: str, method: str = "semantic") -> List[str]:
     """
@@ -148,10 +218,13 @@ def search_similar_chunks(query, chunks, search_target, top_k=3):
         if hasattr(search_target, 'query'):  # It's a ChromaDB collection
             results = search_target.query(
                 query_texts=[query],
-                n_results=top_k
+                n_results=top_k,
+                include=["metadatas", "documents"]
             )
-            # Return the documents from ChromaDB results
-            return results['documents'][0] if results['documents'] else []
+            # Chunk text is kept in the chunk store, not in ChromaDB
+            if not results['metadatas']:
+                return []
+            return resolve_chunk_texts(results['metadatas'][0], results['documents'][0])
         else:
             # Fallback for other cases (shouldn't happen with ChromaDB)
             st.error("Invalid search target")
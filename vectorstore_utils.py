@@ -1,23 +1,196 @@
+import os
+import heapq
+import hashlib
+import numpy as np
 import chromadb
-from typing import List, Dict
+from chromadb.utils import embedding_functions
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from chunk_store import ChunkStore
+from embedding_store import EmbeddingMatrixStore
+from shard_registry import ShardRegistry
 
 # Global client and collection
 client = None
 collection = None
+# Chunk text lives in the compressed store; ChromaDB keeps ids, embeddings and metadata
+chunk_store = None
+embedding_function = None
+# Per-document memory-mapped matrices for exact single-document search
+embedding_store = None
+
+# Optional sharding of chunks across collections:
+#   "none"     - every document in the single pdf_chunks collection
+#   "document" - one collection per document
+#   "hash"     - documents hashed into SHARD_COUNT bucket collections
+# The mode only places new documents; existing ones are found through
+# shard_registry, so changing it never strands data
+SHARDING_MODE = os.getenv("CHROMA_SHARDING", "none")
+SHARD_COUNT = int(os.getenv("CHROMA_SHARD_COUNT", "16"))
+SHARD_PREFIX = "pdf_chunks_"
+DOCUMENT_SHARD_PREFIX = f"{SHARD_PREFIX}doc_"
+# Maximum number of shards queried in parallel by unscoped searches
+MAX_PARALLEL_SHARD_QUERIES = 8
+# Cache of shard name -> collection
+shards = {}
+# Where each document's chunks were written
+shard_registry = None
 
 def initialize_chromadb():
-    """Initialize ChromaDB client and collection"""
-    global client, collection
+    """Initialize ChromaDB client, collection and chunk text store"""
+    global client, collection, chunk_store, embedding_function, embedding_store, shard_registry
 
     if client is None:
         # Create persistent client
         client = chromadb.PersistentClient(path="./chroma_db")
 
+    if embedding_function is None:
+        embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
     if collection is None:
-        collection = client.get_or_create_collection(name="pdf_chunks")
+        collection = client.get_or_create_collection(
+            name="pdf_chunks",
+            embedding_function=embedding_function
+        )
+
+    if chunk_store is None:
+        chunk_store = ChunkStore()
+
+    if embedding_store is None:
+        # float16 / int8 trade a little precision for 2x / 4x smaller matrices
+        embedding_store = EmbeddingMatrixStore(dtype=os.getenv("EMBEDDING_DTYPE", "float32"))
+
+    if shard_registry is None:
+        shard_registry = ShardRegistry()
 
     return collection
 
+def _shard_name(doc_id: str) -> str:
+    """Name of the collection a new document is placed in under the current settings"""
+    if SHARDING_MODE == "document":
+        # Hash the ID since collection names only allow a restricted character set
+        return f"{DOCUMENT_SHARD_PREFIX}{hashlib.sha1(doc_id.encode('utf-8')).hexdigest()[:20]}"
+    if SHARDING_MODE == "hash":
+        bucket = int(hashlib.sha1(doc_id.encode('utf-8')).hexdigest(), 16) % SHARD_COUNT
+        return f"{SHARD_PREFIX}{bucket:04d}"
+    return "pdf_chunks"
+
+def _get_shard(doc_id: str, create: bool = True):
+    """
+    Get the collection that owns a document's chunks
+
+    The recorded shard is used if there is one. Otherwise, when create is
+    set, the shard is picked from the current settings and recorded;
+    unrecorded documents are looked up in the base collection, where
+    documents added before sharding existed live.
+
+    Args:
+        doc_id: Document identifier
+        create: Create and record the shard if none is recorded yet
+
+    Returns:
+        The collection, or None if it does not exist and create is False
+    """
+    base = initialize_chromadb()
+    name = shard_registry.get_shard(doc_id)
+    if name is None:
+        if not create:
+            return base
+        name = _shard_name(doc_id)
+        shard_registry.set_shard(doc_id, name)
+    if name == base.name:
+        return base
+
+    if name not in shards:
+        if create:
+            shards[name] = client.get_or_create_collection(name=name, embedding_function=embedding_function)
+        else:
+            try:
+                shards[name] = client.get_collection(name=name, embedding_function=embedding_function)
+            except Exception:
+                return None
+    return shards[name]
+
+def _forget_unwritten_shard(doc_id: str):
+    """
+    Undo _get_shard for a document whose first write failed
+
+    Drops the registry entry, and the per-document collection if it is
+    empty, so failed ingests leave no collection for unscoped searches to
+    query. Nothing is removed if chunks of the document are stored.
+    """
+    try:
+        shard = _get_shard(doc_id, create=False)
+        if shard is not None:
+            if shard.get(where={"doc_id": doc_id}, limit=1)['ids']:
+                return
+            if shard.name.startswith(DOCUMENT_SHARD_PREFIX) and shard.count() == 0:
+                client.delete_collection(name=shard.name)
+                shards.pop(shard.name, None)
+        shard_registry.delete_shard(doc_id)
+
+    except Exception as e:
+        print(f"Error removing shard for document {doc_id}: {e}")
+
+def _all_shards() -> list:
+    """
+    All collections holding chunks
+
+    Every pdf_chunks_* collection is listed whatever the current mode, so
+    documents written under earlier sharding settings stay searchable.
+    """
+    base = initialize_chromadb()
+    collections = [base]
+    for entry in client.list_collections():
+        name = entry if isinstance(entry, str) else entry.name
+        if name.startswith(SHARD_PREFIX):
+            if name not in shards:
+                shards[name] = client.get_collection(name=name, embedding_function=embedding_function)
+            collections.append(shards[name])
+    return collections
+
+def _add_chunks(collection, doc_id: str, chunks: List[str], start_index: int = 0, pending: bool = False):
+    """Store chunk text in the chunk store and its embeddings in ChromaDB and the matrix store"""
+    content_hashes = chunk_store.put_many(chunks)
+    indices = range(start_index, start_index + len(chunks))
+
+    try:
+        embeddings = np.asarray(embedding_function(chunks), dtype=np.float32)
+        embedding_store.append(doc_id, embeddings, content_hashes)
+        collection.add(
+            ids=[f"{doc_id}_chunk_{i}" for i in indices],
+            embeddings=embeddings,
+            metadatas=[
+                {"doc_id": doc_id, "chunk_index": i, "content_hash": content_hash, "pending": pending}
+                for i, content_hash in zip(indices, content_hashes)
+            ]
+        )
+    except Exception:
+        # A partially written matrix is useless, so drop the whole document's matrix
+        chunk_store.release_many(content_hashes)
+        embedding_store.delete(doc_id)
+        raise
+
+def resolve_chunk_texts(metadatas: List[dict], documents: Optional[List[str]] = None) -> List[str]:
+    """
+    Look up chunk text for ChromaDB results in one bulk chunk store read
+
+    Chunks written before the chunk store existed keep their text in
+    ChromaDB's documents field, which is used as a fallback.
+    """
+    initialize_chromadb()
+
+    documents = documents or [None] * len(metadatas)
+    content_hashes = [(metadata or {}).get('content_hash') for metadata in metadatas]
+    texts = chunk_store.get_many(h for h in content_hashes if h)
+
+    return [
+        texts.get(content_hash, document) if content_hash else document
+        for content_hash, document in zip(content_hashes, documents)
+    ]
+
 def add_document_to_chromadb(doc_id: str, chunks: List[str]) -> bool:
     """
     Add a specific document's chunks to ChromaDB
@@ -30,26 +203,94 @@ def add_document_to_chromadb(doc_id: str, chunks: List[str]) -> bool:
         True if successful, False otherwise
     """
     try:
-        collection = initialize_chromadb()
-
-        # Create chunk IDs with document prefix
-        chunk_ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
-
-        # Create metadata for each chunk
-        metadatas = [{"doc_id": doc_id, "chunk_index": i} for i in range(len(chunks))]
+        collection = _get_shard(doc_id)
 
-        # Add to ChromaDB
-        collection.add(
-            documents=chunks,
-            ids=chunk_ids,
-            metadatas=metadatas
-        )
+        # Chunk IDs are prefixed with the document ID
+        _add_chunks(collection, doc_id, chunks)
 
         print(f"Added {len(chunks)} chunks for document {doc_id}")
         return True
 
     except Exception as e:
         print(f"Error adding document {doc_id} to ChromaDB: {e}")
+        _forget_unwritten_shard(doc_id)
+        return False
+
+def add_document_to_chromadb_streaming(doc_id: str, chunks: Iterable[str], batch_size: int = 256,
+                                       progress_callback: Optional[Callable[[int], bool]] = None,
+                                       pending: bool = False) -> Optional[int]:
+    """
+    Add a document's chunks to ChromaDB in fixed-size batches
+
+    Chunks are pulled lazily from the iterable, so at most batch_size chunks
+    are held in memory at once. If any batch fails, or the write is
+    aborted, the chunks already written for this document are removed again.
+
+    Args:
+        doc_id: Unique document identifier
+        chunks: Iterable (typically a generator) of text chunks
+        batch_size: Number of chunks written per collection.add call
+        progress_callback: Called with the number of chunks written so far
+            after each batch; returning False aborts the write
+        pending: Write the chunks flagged as pending, which keeps them out of
+            "Search all documents" until publish_document_in_chromadb is called
+
+    Returns:
+        Number of chunks added, or None if the write failed or was aborted
+    """
+    collection = _get_shard(doc_id)
+    chunk_iter = iter(chunks)
+    added = 0
+
+    try:
+        while True:
+            batch = list(islice(chunk_iter, batch_size))
+            if not batch:
+                break
+
+            _add_chunks(collection, doc_id, batch, start_index=added, pending=pending)
+            added += len(batch)
+
+            if progress_callback and progress_callback(added) is False:
+                print(f"Aborted adding document {doc_id} after {added} chunks")
+                delete_document_from_chromadb(doc_id)
+                return None
+
+        print(f"Added {added} chunks for document {doc_id}")
+        return added
+
+    except Exception as e:
+        print(f"Error adding document {doc_id} to ChromaDB: {e}")
+        if added:
+            delete_document_from_chromadb(doc_id)
+        else:
+            _forget_unwritten_shard(doc_id)
+        return None
+
+def publish_document_in_chromadb(doc_id: str, chunk_count: int, batch_size: int = 256) -> bool:
+    """
+    Clear the pending flag on a document's chunks so unscoped searches see them
+
+    Args:
+        doc_id: Document identifier
+        chunk_count: Number of chunks written for the document
+        batch_size: Number of chunks updated per call
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        collection = _get_shard(doc_id, create=False)
+        for start in range(0, chunk_count, batch_size):
+            indices = range(start, min(start + batch_size, chunk_count))
+            collection.update(
+                ids=[f"{doc_id}_chunk_{i}" for i in indices],
+                metadatas=[{"pending": False} for _ in indices]
+            )
+        return True
+
+    except Exception as e:
+        print(f"Error publishing document {doc_id} in ChromaDB: {e}")
         return False
 
 def search_in_document(query: str, doc_id: str = None, top_k: int = 3) -> List[str]:
@@ -65,23 +306,40 @@ def search_in_document(query: str, doc_id: str = None, top_k: int = 3) -> List[s
         List of matching text chunks
     """
     try:
-        collection = initialize_chromadb()
+        initialize_chromadb()
+        query_embeddings = embedding_function([query])
 
-        # Build where clause for document filtering
-        where_clause = None
-        if doc_id:
-            where_clause = {"doc_id": doc_id}
-
-        # Search the collection
-        results = collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            where=where_clause
-        )
+        # Scoped queries are answered by an exact scan of the document's matrix
+        if doc_id and embedding_store.has_document(doc_id):
+            content_hashes = embedding_store.search(doc_id, query_embeddings[0], top_k)
+            texts = chunk_store.get_many(content_hashes)
+            return [texts[h] for h in content_hashes if h in texts]
 
-        # Return the document texts
-        if results and results.get('documents') and results['documents'][0]:
-            return results['documents'][0]
+        # Scoped queries go straight to the owning shard
+        if doc_id:
+            hits = []
+            shard = _get_shard(doc_id, create=False)
+            if shard is not None:
+                # A per-document shard needs no metadata filter
+                where_clause = None if shard.name.startswith(DOCUMENT_SHARD_PREFIX) else {"doc_id": doc_id}
+                hits = _query_collection(shard, query_embeddings, top_k, where_clause)
+        else:
+            # Unscoped queries fan out across shards in parallel and merge the top_k;
+            # chunks of documents still being ingested are skipped
+            targets = _all_shards()
+            where_clause = {"pending": {"$ne": True}}
+            if len(targets) == 1:
+                hits = _query_collection(targets[0], query_embeddings, top_k, where_clause)
+            else:
+                with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_SHARD_QUERIES, len(targets))) as executor:
+                    shard_hits = list(executor.map(
+                        lambda c: _query_collection(c, query_embeddings, top_k, where_clause), targets
+                    ))
+                hits = heapq.nsmallest(top_k, (hit for hits in shard_hits for hit in hits), key=lambda hit: hit[0])
+
+        # Text for the hits is fetched from the chunk store
+        if hits:
+            return resolve_chunk_texts([hit[1] for hit in hits], [hit[2] for hit in hits])
         else:
             return []
 
@@ -89,6 +347,19 @@ def search_in_document(query: str, doc_id: str = None, top_k: int = 3) -> List[s
         print(f"Error searching ChromaDB: {e}")
         return []
 
+def _query_collection(target, query_embeddings, top_k: int, where_clause: dict = None) -> list:
+    """Query one collection, returning (distance, metadata, document) tuples, nearest first"""
+    results = target.query(
+        query_embeddings=query_embeddings,
+        n_results=top_k,
+        where=where_clause,
+        include=["metadatas", "documents", "distances"]
+    )
+
+    if not results or not results.get('metadatas') or not results['metadatas'][0]:
+        return []
+    return list(zip(results['distances'][0], results['metadatas'][0], results['documents'][0]))
+
 def get_documents_in_chromadb() -> Dict[str, int]:
     """
     Get all document IDs and their chunk counts from ChromaDB
@@ -104,15 +375,14 @@ def get_documents_in_chromadb() -> Dict[str, int]:
             print("Warning: ChromaDB collection is None")
             return {}
 
-        # Get all documents
-        all_docs = collection.get()
-
-        # Count chunks per document
+        # Count chunks per document; only metadata is needed
         doc_counts = {}
-        if all_docs and all_docs.get('metadatas'):
-            for metadata in all_docs['metadatas']:
-                doc_id = metadata.get('doc_id', 'unknown')
-                doc_counts[doc_id] = doc_counts.get(doc_id, 0) + 1
+        for shard in _all_shards():
+            all_docs = shard.get(include=["metadatas"])
+            if all_docs and all_docs.get('metadatas'):
+                for metadata in all_docs['metadatas']:
+                    doc_id = metadata.get('doc_id', 'unknown')
+                    doc_counts[doc_id] = doc_counts.get(doc_id, 0) + 1
 
         return doc_counts
 
@@ -133,12 +403,27 @@ def delete_document_from_chromadb(doc_id: str) -> bool:
     initialize_chromadb()
 
     try:
-        # Find all chunks for this document
-        results = collection.get(where={"doc_id": doc_id})
+        embedding_store.delete(doc_id)
+
+        # Find all chunks for this document in its recorded shard
+        shard = _get_shard(doc_id, create=False)
+        results = {'ids': []}
+        if shard is not None and shard.name.startswith(DOCUMENT_SHARD_PREFIX):
+            # The whole shard belongs to this document, so drop the collection
+            results = shard.get(include=["metadatas"])
+            client.delete_collection(name=shard.name)
+            shards.pop(shard.name, None)
+        elif shard is not None:
+            results = shard.get(where={"doc_id": doc_id}, include=["metadatas"])
+            if results['ids']:
+                shard.delete(ids=results['ids'])
+        shard_registry.delete_shard(doc_id)
 
         if results['ids']:
-            # Delete all chunks for this document
-            collection.delete(ids=results['ids'])
+            chunk_store.release_many(
+                metadata['content_hash'] for metadata in results['metadatas']
+                if metadata and metadata.get('content_hash')
+            )
             print(f"Deleted {len(results['ids'])} chunks for document {doc_id}")
             return True
         else:
@@ -154,11 +439,19 @@ def clear_all_chromadb():
     initialize_chromadb()
 
     try:
-        # Get all document IDs and delete them
-        all_docs = collection.get()
+        # Drop every shard, whatever mode created it, then delete all IDs from the base collection
+        for shard in _all_shards():
+            if shard is not collection:
+                client.delete_collection(name=shard.name)
+        shards.clear()
+        shard_registry.clear_all()
+
+        all_docs = collection.get(include=[])
         if all_docs['ids']:
             collection.delete(ids=all_docs['ids'])
-            print("Cleared all documents from ChromaDB")
+        print("Cleared all documents from ChromaDB")
+        chunk_store.clear_all()
+        embedding_store.clear_all()
     except Exception as e:
         print(f"Error clearing ChromaDB: {e}")
 
@@ -175,8 +468,11 @@ def load_index():
     """Legacy function - returns collection and all documents"""
     initialize_chromadb()
 
-    # Get all documents
-    all_docs = collection.get()
-    docs = all_docs['documents'] if all_docs['documents'] else []
+    # Get all documents from every shard
+    docs = []
+    for shard in _all_shards():
+        all_docs = shard.get(include=["metadatas", "documents"])
+        if all_docs['ids']:
+            docs.extend(resolve_chunk_texts(all_docs['metadatas'], all_docs['documents']))
 
     return collection, docs
\ No newline at end of file